@@ -1,6 +1,8 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler
 from database import Database
+from inline_status import team_index
+from tracing import MAX_SLOWEST_TRACES, enable_profiling, get_slowest_traces, format_trace
 
 db = Database()
 
@@ -70,11 +72,13 @@ async def handle_team_action(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     if action == "approve":
         db.update_team_status(team_id, "approved")
+        team_index.mark_stale()
         await query.edit_message_reply_markup(reply_markup=None)
         await query.message.reply_text(f"✅ Команда одобрена!")
     
     elif action == "reject":
         db.update_team_status(team_id, "rejected")
+        team_index.mark_stale()
         await query.edit_message_reply_markup(reply_markup=None)
         await query.message.reply_text(f"❌ Команда отклонена!")
     
@@ -88,3 +92,91 @@ async def handle_team_action(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
 
     await query.answer()
+
+async def tournaments_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Показать список турниров."""
+    if not db.is_admin(update.effective_user.id):
+        await update.message.reply_text("У вас нет доступа к этой функции.")
+        return
+
+    active = db.get_active_tournament()
+    message = f"🏆 Текущий турнир: {active['name']}\n\nВсе турниры:\n"
+    for tournament in db.get_tournaments():
+        if tournament['is_active']:
+            state = "🟢 активный"
+        elif tournament['archived_date']:
+            state = f"📦 в архиве ({tournament['archive_file']})"
+        else:
+            state = "⚪️ завершён"
+        message += f"#{tournament['id']} {tournament['name']} — {state}\n"
+
+    message += (
+        "\n/new_tournament <название> — начать новый турнир\n"
+        "/archive_tournament <id> — перенести завершённый турнир в архив"
+    )
+    await update.message.reply_text(message)
+
+async def new_tournament_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Начать новый турнир; регистрация дальше идёт в него."""
+    if not db.is_admin(update.effective_user.id):
+        await update.message.reply_text("У вас нет доступа к этой функции.")
+        return
+
+    name = " ".join(context.args).strip()
+    if not name:
+        await update.message.reply_text("Использование: /new_tournament <название>")
+        return
+
+    tournament_id = db.create_tournament(name)
+    team_index.mark_stale()
+    await update.message.reply_text(f"✅ Турнир #{tournament_id} «{name}» создан и стал активным.")
+
+async def archive_tournament_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Перенести завершённый турнир в отдельный файл архива."""
+    if not db.is_admin(update.effective_user.id):
+        await update.message.reply_text("У вас нет доступа к этой функции.")
+        return
+
+    if len(context.args) != 1 or not context.args[0].isdigit():
+        await update.message.reply_text("Использование: /archive_tournament <id>")
+        return
+
+    archive_file = db.archive_tournament(int(context.args[0]))
+    if not archive_file:
+        await update.message.reply_text(
+            "❌ Турнир не найден, ещё активен или уже находится в архиве."
+        )
+        return
+
+    await update.message.reply_text(f"📦 Турнир перенесён в архив: {archive_file}")
+
+async def trace_profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Включить cProfile и запись стеков для следующих N обновлений."""
+    if not db.is_admin(update.effective_user.id):
+        await update.message.reply_text("У вас нет доступа к этой функции.")
+        return
+
+    if len(context.args) != 1 or not context.args[0].isdigit():
+        await update.message.reply_text("Использование: /trace_profile <количество обновлений>")
+        return
+
+    count = int(context.args[0])
+    enable_profiling(count)
+    await update.message.reply_text(f"🔬 Профилирование включено для следующих {count} обновлений.")
+
+async def trace_slowest_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Показать самые медленные из последних трассировок."""
+    if not db.is_admin(update.effective_user.id):
+        await update.message.reply_text("У вас нет доступа к этой функции.")
+        return
+
+    count = int(context.args[0]) if context.args and context.args[0].isdigit() else 5
+    count = max(1, min(count, MAX_SLOWEST_TRACES))
+    traces = get_slowest_traces(count)
+
+    if not traces:
+        await update.message.reply_text("Трассировок пока нет.")
+        return
+
+    for trace in traces:
+        await update.message.reply_text(format_trace(trace))
@@ -1,18 +1,31 @@
 import logging
 import os
-import re
 import asyncio
 
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ConversationHandler, filters, ContextTypes
+from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ConversationHandler, InlineQueryHandler, TypeHandler, filters, ContextTypes
+from telegram.helpers import escape_markdown
 from pyrogram import Client
 from pyrogram.enums import ParseMode
 
 # Добавленные импорты
 from database import Database  # Предполагается, что файл database.py существует
-from admin_handlers import admin_command, admin_teams_list, handle_team_action  # Предполагается, что файл admin_handlers.py существует
+from admin_handlers import admin_command, admin_teams_list, handle_team_action, tournaments_command, new_tournament_command, archive_tournament_command, trace_profile_command, trace_slowest_command  # Предполагается, что файл admin_handlers.py существует
 from registration_status import check_registration_status, handle_team_name_status # Предполагается, что файл registration_status.py существует
+from session_cleanup import (
+    CONVERSATION_TIMEOUT,
+    SWEEP_INTERVAL,
+    MAX_TEAM_NAME_LENGTH,
+    track_activity,
+    clear_registration_data,
+    handle_conversation_timeout,
+    sweep_user_data,
+)
+from roster import MIN_PLAYERS, MAX_PLAYERS, MAX_REPORTED_ERRORS, parse_roster
+from inline_status import inline_team_status
+from rate_limit import rate_limit_middleware, limit_concurrency, sweep_buckets
+from tracing import traced, span
 
 # Enable logging
 logging.basicConfig(
@@ -92,9 +105,11 @@ def get_confirmation_keyboard():
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Send welcome message and show main menu."""
-    welcome_message = """🏆 Добро пожаловать в бота регистрации на турнир
+    clear_registration_data(context.user_data)
+    tournament = db.get_active_tournament()
+    welcome_message = f"""🏆 Добро пожаловать в бота регистрации на турнир
 
-"M5 Domination Cup"
+"{tournament['name']}"
 
 
 Я помогу вам зарегистрироваться на турнир и предоставлю всю необходимую информацию.
@@ -124,8 +139,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 
 async def start_registration(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Start the registration process."""
+    tournament = db.get_active_tournament()
     await update.message.reply_text(
-        "📢 Для участия в M5 Domination Cup необходимо быть подписанным на наш канал!\n\n"
+        f"📢 Для участия в {escape_markdown(tournament['name'])} необходимо быть подписанным на наш канал!\n\n"
         "🔗 Подпишись на [M5 Cup](https://t.me/m5cup), затем нажми \"Проверить подписку\".\n\n"
         "🛑 Если ты уже подписан, просто нажми \"Проверить подписку\".",
         reply_markup=get_registration_keyboard(),
@@ -135,6 +151,7 @@ async def start_registration(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 async def back_to_main(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Return to main menu."""
+    clear_registration_data(context.user_data)
     await update.message.reply_text(
         "Вы вернулись в главное меню. Выберите нужное действие:",
         reply_markup=get_main_keyboard()
@@ -143,8 +160,9 @@ async def back_to_main(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
 async def back_to_checking_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Return to subscription checking step."""
+    tournament = db.get_active_tournament()
     await update.message.reply_text(
-        "📢 Для участия в M5 Domination Cup необходимо быть подписанным на наш канал!\n\n"
+        f"📢 Для участия в {escape_markdown(tournament['name'])} необходимо быть подписанным на наш канал!\n\n"
         "🔗 Подпишись на [M5 Cup](https://t.me/m5cup), затем нажми \"Проверить подписку\".\n\n"
         "🛑 Если ты уже подписан, просто нажми \"Проверить подписку\".",
         reply_markup=get_registration_keyboard(),
@@ -180,41 +198,54 @@ async def back_to_players_list(update: Update, context: ContextTypes.DEFAULT_TYP
     )
     return PLAYERS_LIST
 
+@traced
 async def check_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Check if user is subscribed to the channel."""
     try:
         user_id = update.message.from_user.id
-        chat_member = await context.bot.get_chat_member(chat_id=CHANNEL_ID, user_id=user_id)
+        with span("bot.get_chat_member"):
+            chat_member = await context.bot.get_chat_member(chat_id=CHANNEL_ID, user_id=user_id)
 
         if chat_member.status in ['member', 'administrator', 'creator']:
-            await update.message.reply_text(
-                "🎮 Отлично! Теперь введи название твоей команды.\n\n"
-                "✍🏼 Напиши название в ответном сообщении.",
-                reply_markup=get_back_keyboard()
-            )
+            with span("bot.send_message"):
+                await update.message.reply_text(
+                    "🎮 Отлично! Теперь введи название твоей команды.\n\n"
+                    "✍🏼 Напиши название в ответном сообщении.",
+                    reply_markup=get_back_keyboard()
+                )
             return TEAM_NAME
         else:
-            await update.message.reply_text(
-                "❌ Вы не подписаны на канал. Пожалуйста, подпишитесь на @m5cup и попробуйте снова.",
-                reply_markup=get_registration_keyboard()
-            )
+            with span("bot.send_message"):
+                await update.message.reply_text(
+                    "❌ Вы не подписаны на канал. Пожалуйста, подпишитесь на @m5cup и попробуйте снова.",
+                    reply_markup=get_registration_keyboard()
+                )
             return CHECKING_SUBSCRIPTION
 
     except Exception as e:
         logger.error(f"Error checking subscription: {e}")
-        await update.message.reply_text(
-            "❌ Произошла ошибка при проверке подписки. Пожалуйста, убедитесь, что вы:\n\n"
-            "1. Перешли по ссылке в канал\n"
-            "2. Подписались на канал\n"
-            "3. Нажали кнопку \"Проверить подписку\"\n\n"
-            "Если проблема сохраняется, попробуйте позже.",
-            reply_markup=get_registration_keyboard()
-        )
+        with span("bot.send_message"):
+            await update.message.reply_text(
+                "❌ Произошла ошибка при проверке подписки. Пожалуйста, убедитесь, что вы:\n\n"
+                "1. Перешли по ссылке в канал\n"
+                "2. Подписались на канал\n"
+                "3. Нажали кнопку \"Проверить подписку\"\n\n"
+                "Если проблема сохраняется, попробуйте позже.",
+                reply_markup=get_registration_keyboard()
+            )
         return CHECKING_SUBSCRIPTION
 
 async def receive_team_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Receive and store team name."""
     team_name = update.message.text
+
+    if len(team_name) > MAX_TEAM_NAME_LENGTH:
+        await update.message.reply_text(
+            f"⚠️ Название команды слишком длинное (максимум {MAX_TEAM_NAME_LENGTH} символов). Пожалуйста, введите название покороче.",
+            reply_markup=get_back_keyboard()
+        )
+        return TEAM_NAME
+
     context.user_data['team_name'] = team_name
 
     await update.message.reply_text(
@@ -237,7 +268,8 @@ async def receive_team_name(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def get_tg_id_by_username(username: str):
     """Gets Telegram ID by username using Pyrogram."""
     try:
-        users = await userbot.get_users(username)
+        with span("pyrogram.get_users"):
+            users = await userbot.get_users(username)
         if users:
             if isinstance(users, list):
                 if users:
@@ -252,33 +284,71 @@ async def get_tg_id_by_username(username: str):
         logger.error(f"Error getting Telegram ID for {username}: {e}")
         return None
 
+@traced
 async def check_players_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Check and validate players list and check subscription status."""
-    players_text = update.message.text
-    players = []
-    player_pattern = re.compile(r"(.+?)\s*[-–]\s*@([a-zA-Z0-9_]+)")
-
-    for line in players_text.split('\n'):
-        match = player_pattern.match(line)
-        if match:
-            nickname = match.group(1).strip()
-            username = match.group(2).strip()
-            players.append((nickname, username))
-
-    if len(players) < 4:
-        await update.message.reply_text(
-            "⚠️ Необходимо указать минимум 4 игрока. Пожалуйста, проверьте формат и количество игроков и отправьте список снова.",
-            reply_markup=get_back_keyboard()
-        )
+    """Validate players list and check subscription status."""
+    players, errors = parse_roster(update.message.text)
+
+    if errors:
+        message = "⚠️ В списке игроков есть ошибки:\n"
+        for error in errors[:MAX_REPORTED_ERRORS]:
+            message += f"• {error}\n"
+        if len(errors) > MAX_REPORTED_ERRORS:
+            message += f"… и ещё ошибок: {len(errors) - MAX_REPORTED_ERRORS}\n"
+        message += "\nПожалуйста, исправьте список и отправьте его снова."
+        with span("bot.send_message"):
+            await update.message.reply_text(message, reply_markup=get_back_keyboard())
+        return PLAYERS_LIST
+
+    if len(players) < MIN_PLAYERS:
+        with span("bot.send_message"):
+            await update.message.reply_text(
+                f"⚠️ Необходимо указать минимум {MIN_PLAYERS} игрока. Пожалуйста, проверьте формат и количество игроков и отправьте список снова.",
+                reply_markup=get_back_keyboard()
+            )
+        return PLAYERS_LIST
+
+    if len(players) > MAX_PLAYERS:
+        with span("bot.send_message"):
+            await update.message.reply_text(
+                f"⚠️ В составе может быть не более {MAX_PLAYERS} игроков. Пожалуйста, сократите список и отправьте его снова.",
+                reply_markup=get_back_keyboard()
+            )
+        return PLAYERS_LIST
+
+    # Проверяем игроков, уже заявленных в других командах, до обращений к API
+    with span("sqlite.find_registered_players"):
+        registered = db.find_registered_players([username for _, username in players])
+    if registered:
+        message = "⚠️ Следующие игроки уже заявлены в других командах:\n"
+        for nickname, username in players:
+            team_name = registered.get(username.lower())
+            if team_name:
+                message += f"• {nickname} – @{username} (команда {team_name})\n"
+        message += "\nПожалуйста, исправьте список и отправьте его снова."
+        with span("bot.send_message"):
+            await update.message.reply_text(message, reply_markup=get_back_keyboard())
         return PLAYERS_LIST
 
     context.user_data['players'] = players
 
-    await update.message.reply_text(
-        "⏳ Проверяем подписку игроков на канал. Это может занять некоторое время...",
-        reply_markup=ReplyKeyboardRemove()
+    return await check_roster_subscription(update, context, players)
+
+async def check_in_progress(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Reply to any message sent while the players' subscription check is still running."""
+    await update.effective_message.reply_text(
+        "⏳ Проверка подписки игроков ещё выполняется. Пожалуйста, дождитесь результата."
     )
 
+@limit_concurrency
+async def check_roster_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE, players) -> int:
+    """Check channel subscription of every player in a validated roster."""
+    with span("bot.send_message"):
+        await update.message.reply_text(
+            "⏳ Проверяем подписку игроков на канал. Это может занять некоторое время...",
+            reply_markup=ReplyKeyboardRemove()
+        )
+
     unsubscribed_players = []
     subscribed_players = []
 
@@ -287,7 +357,8 @@ async def check_players_subscription(update: Update, context: ContextTypes.DEFAU
 
         if telegram_id:
             try:
-                chat_member = await context.bot.get_chat_member(chat_id=CHANNEL_ID, user_id=telegram_id)
+                with span("bot.get_chat_member"):
+                    chat_member = await context.bot.get_chat_member(chat_id=CHANNEL_ID, user_id=telegram_id)
                 if chat_member.status in ['member', 'administrator', 'creator']:
                     subscribed_players.append(f"{nickname} – @{username}")
                 else:
@@ -312,7 +383,8 @@ async def check_players_subscription(update: Update, context: ContextTypes.DEFAU
     # Сохраняем сообщение для повторного использования
     context.user_data['subscription_message'] = message
     
-    await update.message.reply_text(message, reply_markup=get_confirmation_keyboard())
+    with span("bot.send_message"):
+        await update.message.reply_text(message, reply_markup=get_confirmation_keyboard())
     return CONFIRMATION
 
 async def handle_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -346,6 +418,7 @@ async def handle_confirmation(update: Update, context: ContextTypes.DEFAULT_TYPE
     elif user_choice == "Назад":
         return await back_to_players_list(update, context)
 
+@traced
 async def finish_registration(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Complete the registration process."""
     captain_contact = update.message.text
@@ -354,8 +427,11 @@ async def finish_registration(update: Update, context: ContextTypes.DEFAULT_TYPE
     team_name = context.user_data.get('team_name', 'Не указано')
     players = context.user_data.get('players', [])
 
+    with span("sqlite.get_active_tournament"):
+        tournament = db.get_active_tournament()
+
     registration_info = (
-        f"✅ Поздравляем! Ваша команда успешно зарегистрирована на M5 Domination Cup!\n\n"
+        f"✅ Поздравляем! Ваша команда успешно зарегистрирована на {tournament['name']}!\n\n"
         f"📋 Информация о регистрации:\n"
         f"🎮 Название команды: {team_name}\n\n"
         f"👥 Состав команды:\n"
@@ -368,13 +444,17 @@ async def finish_registration(update: Update, context: ContextTypes.DEFAULT_TYPE
     registration_info += "📢 Вскоре мы свяжемся с капитаном для подтверждения участия.\n\n"
     registration_info += "🔥 Удачи в турнире! 🎮🏆"
 
-    await update.message.reply_text(registration_info, reply_markup=get_main_keyboard())
+    clear_registration_data(context.user_data)
+
+    with span("bot.send_message"):
+        await update.message.reply_text(registration_info, reply_markup=get_main_keyboard())
     return ConversationHandler.END
 
 async def tournament_info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Show tournament information."""
+    tournament = db.get_active_tournament()
     await update.message.reply_text(
-        "🏆 M5 Domination Cup\n\n"
+        f"🏆 {tournament['name']}\n\n"
         "📅 Информация о турнире будет добавлена позже.",
         reply_markup=get_back_keyboard()
     )
@@ -406,13 +486,36 @@ async def post_init(application: Application):
 
 def main() -> None:
     """Start the bot."""
-    application = Application.builder().token(BOT_TOKEN).post_init(post_init).build()
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .post_init(post_init)
+        .build()
+    )
+
+    # Ограничиваем частоту запросов до всех остальных обработчиков
+    application.add_handler(TypeHandler(Update, rate_limit_middleware), group=-2)
+
+    # Отмечаем активность пользователя до всех остальных обработчиков
+    application.add_handler(TypeHandler(Update, track_activity), group=-1)
+
+    # Периодически удаляем данные брошенных регистраций
+    application.job_queue.run_repeating(sweep_user_data, interval=SWEEP_INTERVAL, first=SWEEP_INTERVAL)
+    application.job_queue.run_repeating(sweep_buckets, interval=SWEEP_INTERVAL, first=SWEEP_INTERVAL)
 
     # Добавляем обработчики админ-панели
     application.add_handler(CommandHandler("admin", admin_command))
+    application.add_handler(CommandHandler("tournaments", tournaments_command))
+    application.add_handler(CommandHandler("new_tournament", new_tournament_command))
+    application.add_handler(CommandHandler("archive_tournament", archive_tournament_command))
+    application.add_handler(CommandHandler("trace_profile", trace_profile_command))
+    application.add_handler(CommandHandler("trace_slowest", trace_slowest_command))
     application.add_handler(CallbackQueryHandler(admin_teams_list, pattern="^admin_teams_list$"))
     application.add_handler(CallbackQueryHandler(handle_team_action, pattern="^(approve|reject|comment)_team_"))
 
+    # Inline-запросы статуса команды: @bot <название команды>
+    application.add_handler(InlineQueryHandler(inline_team_status))
+
     # Обновляем ConversationHandler
     conv_handler = ConversationHandler(
         entry_points=[
@@ -432,7 +535,8 @@ def main() -> None:
                 MessageHandler(filters.Regex('^Назад$'), back_to_checking_subscription),
             ],
             PLAYERS_LIST: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.Regex('^Назад$'), check_players_subscription),
+                # Проверка выполняется в фоне, чтобы не задерживать обновления других пользователей
+                MessageHandler(filters.TEXT & ~filters.COMMAND & ~filters.Regex('^Назад$'), check_players_subscription, block=False),
                 MessageHandler(filters.Regex('^Назад$'), back_to_team_name),
             ],
             CONFIRMATION: [
@@ -457,8 +561,16 @@ def main() -> None:
                     handle_team_name_status
                 )
             ],
+            # Сообщения пользователя, пока его проверка подписки игроков не завершилась
+            ConversationHandler.WAITING: [
+                MessageHandler(filters.ALL, check_in_progress),
+            ],
+            ConversationHandler.TIMEOUT: [
+                TypeHandler(Update, handle_conversation_timeout),
+            ],
         },
         fallbacks=[CommandHandler('start', start)],
+        conversation_timeout=CONVERSATION_TIMEOUT,
     )
 
     application.add_handler(conv_handler)
@@ -1,7 +1,10 @@
+import os
 import sqlite3
 from datetime import datetime
 from typing import List, Tuple, Optional
 
+DEFAULT_TOURNAMENT_NAME = "M5 Domination Cup"
+
 class Database:
     def __init__(self, db_file: str = "tournament.db"):
         self.db_file = db_file
@@ -11,15 +14,29 @@ class Database:
         with sqlite3.connect(self.db_file) as conn:
             cursor = conn.cursor()
             
+            # Таблица турниров
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tournaments (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    is_active BOOLEAN DEFAULT 0,
+                    created_date TIMESTAMP NOT NULL,
+                    archived_date TIMESTAMP,
+                    archive_file TEXT
+                )
+            ''')
+            
             # Таблица команд
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS teams (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tournament_id INTEGER,
                     team_name TEXT NOT NULL,
                     captain_contact TEXT NOT NULL,
                     registration_date TIMESTAMP NOT NULL,
                     status TEXT DEFAULT 'pending',
-                    admin_comment TEXT
+                    admin_comment TEXT,
+                    FOREIGN KEY (tournament_id) REFERENCES tournaments (id)
                 )
             ''')
             
@@ -27,14 +44,39 @@ class Database:
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS players (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tournament_id INTEGER,
                     team_id INTEGER,
                     nickname TEXT NOT NULL,
                     telegram_username TEXT NOT NULL,
                     is_captain BOOLEAN DEFAULT 0,
+                    FOREIGN KEY (tournament_id) REFERENCES tournaments (id),
                     FOREIGN KEY (team_id) REFERENCES teams (id)
                 )
             ''')
             
+            # Базы, созданные до появления турниров, получают колонку tournament_id
+            for table in ('teams', 'players'):
+                columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})')]
+                if 'tournament_id' not in columns:
+                    cursor.execute(f'ALTER TABLE {table} ADD COLUMN tournament_id INTEGER REFERENCES tournaments (id)')
+            
+            # Всегда есть активный турнир; старые записи относятся к нему
+            tournament_id = self._get_active_tournament_id(cursor)
+            cursor.execute('UPDATE teams SET tournament_id = ? WHERE tournament_id IS NULL', (tournament_id,))
+            cursor.execute('UPDATE players SET tournament_id = ? WHERE tournament_id IS NULL', (tournament_id,))
+            
+            # Индекс для выборки команд турнира
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_teams_tournament
+                ON teams (tournament_id, registration_date)
+            ''')
+            
+            # Индекс для поиска игроков, уже заявленных в других командах
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_players_telegram_username
+                ON players (telegram_username COLLATE NOCASE)
+            ''')
+            
             # Таблица администраторов
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS admins (
@@ -47,24 +89,136 @@ class Database:
             
             conn.commit()
 
+    def _get_active_tournament_id(self, cursor: sqlite3.Cursor) -> int:
+        cursor.execute('SELECT id FROM tournaments WHERE is_active = 1 ORDER BY id DESC LIMIT 1')
+        row = cursor.fetchone()
+        if row:
+            return row[0]
+
+        cursor.execute('''
+            INSERT INTO tournaments (name, is_active, created_date)
+            VALUES (?, 1, ?)
+        ''', (DEFAULT_TOURNAMENT_NAME, datetime.utcnow()))
+        return cursor.lastrowid
+
+    def get_active_tournament(self) -> dict:
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            tournament_id = self._get_active_tournament_id(cursor)
+            cursor.execute('SELECT id, name, created_date FROM tournaments WHERE id = ?', (tournament_id,))
+            tournament = cursor.fetchone()
+            conn.commit()
+            return {
+                'id': tournament[0],
+                'name': tournament[1],
+                'created_date': tournament[2]
+            }
+
+    def get_tournaments(self) -> List[dict]:
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, name, is_active, created_date, archived_date, archive_file
+                FROM tournaments
+                ORDER BY id
+            ''')
+            return [
+                {
+                    'id': row[0],
+                    'name': row[1],
+                    'is_active': bool(row[2]),
+                    'created_date': row[3],
+                    'archived_date': row[4],
+                    'archive_file': row[5]
+                }
+                for row in cursor.fetchall()
+            ]
+
+    def create_tournament(self, name: str) -> int:
+        """Создать новый турнир и сделать его активным."""
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('UPDATE tournaments SET is_active = 0 WHERE is_active = 1')
+            cursor.execute('''
+                INSERT INTO tournaments (name, is_active, created_date)
+                VALUES (?, 1, ?)
+            ''', (name, datetime.utcnow()))
+            conn.commit()
+            return cursor.lastrowid
+
+    def archive_tournament(self, tournament_id: int, archive_dir: str = "archives") -> Optional[str]:
+        """Перенести команды и игроков завершённого турнира в отдельный файл SQLite.
+
+        Активный и уже заархивированный турниры не переносятся. Возвращает путь к архиву или None.
+        """
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT is_active, archived_date FROM tournaments WHERE id = ?', (tournament_id,))
+            tournament = cursor.fetchone()
+        if not tournament or tournament[0] or tournament[1]:
+            return None
+
+        os.makedirs(archive_dir, exist_ok=True)
+        archive_file = os.path.join(archive_dir, f"tournament_{tournament_id}.db")
+        if os.path.exists(archive_file):
+            return None
+
+        conn = sqlite3.connect(self.db_file)
+        try:
+            cursor = conn.cursor()
+            cursor.execute('ATTACH DATABASE ? AS archive', (archive_file,))
+            # sqlite3 не открывает транзакцию перед DDL, поэтому открываем её сами:
+            # копирование в архив и удаление из рабочей базы фиксируются вместе
+            cursor.execute('BEGIN')
+            for table in ('tournaments', 'teams', 'players'):
+                key = 'id' if table == 'tournaments' else 'tournament_id'
+                cursor.execute(f'CREATE TABLE archive.{table} AS SELECT * FROM main.{table} WHERE {key} = ?', (tournament_id,))
+
+            cursor.execute('DELETE FROM players WHERE tournament_id = ?', (tournament_id,))
+            cursor.execute('DELETE FROM teams WHERE tournament_id = ?', (tournament_id,))
+            cursor.execute('''
+                UPDATE tournaments
+                SET archived_date = ?, archive_file = ?
+                WHERE id = ?
+            ''', (datetime.utcnow(), archive_file, tournament_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            conn.close()
+            # Не оставляем частично заполненный архив, иначе повторная попытка будет невозможна
+            if os.path.exists(archive_file):
+                os.remove(archive_file)
+            raise
+
+        try:
+            cursor.execute('DETACH DATABASE archive')
+            # Возвращаем освободившееся место, чтобы рабочая база оставалась компактной
+            cursor.execute('VACUUM')
+        finally:
+            conn.close()
+
+        return archive_file
+
     def register_team(self, team_name: str, players: List[Tuple[str, str]], captain_contact: str) -> int:
         with sqlite3.connect(self.db_file) as conn:
             cursor = conn.cursor()
             
+            tournament_id = self._get_active_tournament_id(cursor)
+            
             # Добавляем команду
             cursor.execute('''
-                INSERT INTO teams (team_name, captain_contact, registration_date)
-                VALUES (?, ?, ?)
-            ''', (team_name, captain_contact, datetime.utcnow()))
+                INSERT INTO teams (tournament_id, team_name, captain_contact, registration_date)
+                VALUES (?, ?, ?, ?)
+            ''', (tournament_id, team_name, captain_contact, datetime.utcnow()))
             
             team_id = cursor.lastrowid
             
             # Добавляем игроков
             for nickname, username in players:
                 cursor.execute('''
-                    INSERT INTO players (team_id, nickname, telegram_username)
-                    VALUES (?, ?, ?)
-                ''', (team_id, nickname, username))
+                    INSERT INTO players (tournament_id, team_id, nickname, telegram_username)
+                    VALUES (?, ?, ?, ?)
+                ''', (tournament_id, team_id, nickname, username))
             
             conn.commit()
             return team_id
@@ -72,12 +226,13 @@ class Database:
     def get_team_status(self, team_name: str) -> Optional[dict]:
         with sqlite3.connect(self.db_file) as conn:
             cursor = conn.cursor()
+            tournament_id = self._get_active_tournament_id(cursor)
             
             cursor.execute('''
                 SELECT t.id, t.team_name, t.status, t.registration_date, t.admin_comment
                 FROM teams t
-                WHERE t.team_name = ?
-            ''', (team_name,))
+                WHERE t.tournament_id = ? AND t.team_name = ?
+            ''', (tournament_id, team_name))
             
             team = cursor.fetchone()
             if not team:
@@ -99,6 +254,26 @@ class Database:
                 'players': players
             }
 
+    def find_registered_players(self, usernames: List[str]) -> dict:
+        """Вернуть {юзернейм в нижнем регистре: название команды} для уже заявленных игроков."""
+        if not usernames:
+            return {}
+
+        with sqlite3.connect(self.db_file) as conn:
+            cursor = conn.cursor()
+            tournament_id = self._get_active_tournament_id(cursor)
+            placeholders = ', '.join('?' * len(usernames))
+            cursor.execute(f'''
+                SELECT p.telegram_username, t.team_name
+                FROM players p
+                JOIN teams t ON t.id = p.team_id
+                WHERE p.telegram_username COLLATE NOCASE IN ({placeholders})
+                  AND p.tournament_id = ?
+                  AND t.status != 'rejected'
+            ''', [*usernames, tournament_id])
+            
+            return {username.lower(): team_name for username, team_name in cursor.fetchall()}
+
     def add_admin(self, telegram_id: int, username: str) -> bool:
         try:
             with sqlite3.connect(self.db_file) as conn:
@@ -139,11 +314,13 @@ class Database:
     def get_all_teams(self) -> List[dict]:
         with sqlite3.connect(self.db_file) as conn:
             cursor = conn.cursor()
+            tournament_id = self._get_active_tournament_id(cursor)
             cursor.execute('''
                 SELECT t.id, t.team_name, t.status, t.registration_date, t.captain_contact, t.admin_comment
                 FROM teams t
+                WHERE t.tournament_id = ?
                 ORDER BY t.registration_date DESC
-            ''')
+            ''', (tournament_id,))
             
             teams = []
             for team in cursor.fetchall():
@@ -0,0 +1,75 @@
+import bisect
+import time
+
+from telegram import Update, InlineQueryResultArticle, InputTextMessageContent
+from telegram.ext import ContextTypes
+from database import Database
+from registration_status import STATUS_EMOJI, format_team_status
+
+db = Database()
+
+# Сколько секунд Telegram может отдавать закэшированный ответ на одинаковый запрос
+INLINE_CACHE_TIME = 60
+# Как часто перестраивается индекс названий команд
+INDEX_TTL = 60
+# Telegram принимает не больше 50 результатов на один inline-запрос
+MAX_INLINE_RESULTS = 50
+
+
+class TeamPrefixIndex:
+    """Отсортированный по названию список команд для поиска по префиксу."""
+
+    def __init__(self, database: Database, ttl: float = INDEX_TTL):
+        self.database = database
+        self.ttl = ttl
+        self._keys = []
+        self._teams = []
+        self._built_at = None
+
+    def mark_stale(self) -> None:
+        self._built_at = None
+
+    def _rebuild(self) -> None:
+        entries = sorted(
+            ((team['team_name'].casefold(), team) for team in self.database.get_all_teams()),
+            key=lambda entry: entry[0]
+        )
+        self._keys = [key for key, _ in entries]
+        self._teams = [team for _, team in entries]
+        self._built_at = time.monotonic()
+
+    def search(self, prefix: str, limit: int = MAX_INLINE_RESULTS) -> list:
+        if self._built_at is None or time.monotonic() - self._built_at > self.ttl:
+            self._rebuild()
+
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self._keys, prefix)
+        results = []
+        for key, team in zip(self._keys[start:start + limit], self._teams[start:start + limit]):
+            if not key.startswith(prefix):
+                break
+            results.append(team)
+        return results
+
+
+team_index = TeamPrefixIndex(db)
+
+
+async def inline_team_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Ответ на inline-запрос @bot <название команды> карточками статуса."""
+    query = update.inline_query
+    prefix = query.query.strip()
+
+    results = []
+    if prefix:
+        for team in team_index.search(prefix):
+            results.append(
+                InlineQueryResultArticle(
+                    id=str(team['id']),
+                    title=team['team_name'],
+                    description=f"{STATUS_EMOJI.get(team['status'], '❓')} {team['status'].title()}",
+                    input_message_content=InputTextMessageContent(format_team_status(team, public=True))
+                )
+            )
+
+    await query.answer(results, cache_time=INLINE_CACHE_TIME)
@@ -0,0 +1,112 @@
+import asyncio
+import functools
+import logging
+import time
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Параметры token bucket для одного пользователя:
+# не больше BUCKET_CAPACITY апдейтов подряд, дальше один апдейт в 1 / REFILL_RATE секунд
+BUCKET_CAPACITY = 5
+REFILL_RATE = 0.5
+# Сколько одновременно может выполняться "дорогих" обработчиков (проверки подписки)
+MAX_CONCURRENT_CHECKS = 3
+# Через сколько секунд бездействия корзина пользователя удаляется
+BUCKET_TTL = 10 * 60
+
+
+class TokenBucket:
+    def __init__(self, capacity: int = BUCKET_CAPACITY, refill_rate: float = REFILL_RATE):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.warned = False
+
+    def consume(self, tokens: float = 1.0) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            self.warned = False
+            return True
+        return False
+
+
+_buckets = {}
+_checks_semaphore = asyncio.Semaphore(MAX_CONCURRENT_CHECKS)
+_users_in_flight = set()
+
+
+async def rate_limit_middleware(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Отбрасывать апдейты пользователя, который превысил лимит запросов."""
+    user = update.effective_user
+    # Inline-запросы приходят почти на каждое нажатие клавиши и обслуживаются из кэша в памяти
+    if user is None or update.inline_query:
+        return
+
+    bucket = _buckets.get(user.id)
+    if bucket is None:
+        bucket = _buckets[user.id] = TokenBucket()
+
+    if bucket.consume():
+        return
+
+    # Предупреждаем один раз за период ограничения, чтобы не тратить API на каждый спам-апдейт
+    if not bucket.warned:
+        bucket.warned = True
+        if update.message:
+            await update.message.reply_text("⏳ Слишком много запросов. Пожалуйста, подождите немного и попробуйте снова.")
+        elif update.callback_query:
+            await update.callback_query.answer("⏳ Слишком много запросов. Подождите немного.")
+
+    raise ApplicationHandlerStop
+
+
+def limit_concurrency(handler):
+    """Ограничить число одновременно выполняющихся дорогих обработчиков.
+
+    У одного пользователя может выполняться только одна проверка, поэтому он не может
+    занять все слоты. Если слоты заняты, пользователь получает короткий ответ,
+    а состояние диалога не меняется.
+    """
+    @functools.wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args):
+        user_id = update.effective_user.id
+        if user_id in _users_in_flight:
+            with span("bot.send_message"):
+                await update.message.reply_text("⏳ Предыдущая проверка ещё выполняется. Пожалуйста, дождитесь результата.")
+            return None
+
+        if _checks_semaphore.locked():
+            with span("bot.send_message"):
+                await update.message.reply_text(
+                    "⏳ Сейчас бот обрабатывает много запросов. Пожалуйста, повторите попытку через минуту."
+                )
+            return None
+
+        _users_in_flight.add(user_id)
+        try:
+            async with _checks_semaphore:
+                return await handler(update, context, *args)
+        finally:
+            _users_in_flight.discard(user_id)
+
+    return wrapper
+
+
+async def sweep_buckets(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Удалить корзины пользователей, которые давно не присылали апдейтов."""
+    now = time.monotonic()
+    expired = [user_id for user_id, bucket in _buckets.items() if now - bucket.updated_at > BUCKET_TTL]
+    for user_id in expired:
+        del _buckets[user_id]
+
+    if expired:
+        logger.info(f"Rate limit sweep: evicted {len(expired)} buckets")
@@ -4,6 +4,34 @@ from database import Database
 
 db = Database()
 
+STATUS_EMOJI = {
+    'pending': '⏳',
+    'approved': '✅',
+    'rejected': '❌'
+}
+
+def format_team_status(team_info: dict, public: bool = False) -> str:
+    """Сформировать карточку со статусом регистрации команды.
+
+    Публичная карточка (для inline-режима) не содержит юзернеймов игроков и комментария администратора.
+    """
+    if public:
+        players_list = "\n".join([f"• {p[0]}" for p in team_info['players']])
+    else:
+        players_list = "\n".join([f"• {p[0]} – {p[1]}" for p in team_info['players']])
+    
+    message = (
+        f"📋 Статус регистрации команды {team_info['team_name']}:\n\n"
+        f"Статус: {STATUS_EMOJI.get(team_info['status'], '❓')} {team_info['status'].title()}\n"
+        f"Дата регистрации: {team_info['registration_date']}\n"
+        f"\n👥 Состав команды:\n{players_list}\n"
+    )
+
+    if team_info['admin_comment'] and not public:
+        message += f"\n💬 Комментарий администратора:\n{team_info['admin_comment']}"
+
+    return message
+
 async def check_registration_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Проверка статуса регистрации команды."""
     await update.message.reply_text(
@@ -24,23 +52,7 @@ async def handle_team_name_status(update: Update, context: ContextTypes.DEFAULT_
         )
         return ConversationHandler.END
 
-    status_emoji = {
-        'pending': '⏳',
-        'approved': '✅',
-        'rejected': '❌'
-    }
-
-    players_list = "\n".join([f"• {p[0]} – {p[1]}" for p in team_info['players']])
-    
-    message = (
-        f"📋 Статус регистрации команды {team_info['team_name']}:\n\n"
-        f"Статус: {status_emoji.get(team_info['status'], '❓')} {team_info['status'].title()}\n"
-        f"Дата регистрации: {team_info['registration_date']}\n"
-        f"\n👥 Состав команды:\n{players_list}\n"
-    )
-
-    if team_info['admin_comment']:
-        message += f"\n💬 Комментарий администратора:\n{team_info['admin_comment']}"
+    message = format_team_status(team_info)
 
     await update.message.reply_text(
         message,
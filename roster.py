@@ -0,0 +1,54 @@
+import re
+from typing import List, Tuple
+
+MIN_PLAYERS = 4
+MAX_PLAYERS = 10
+# Сколько ошибок разбора показывать пользователю в одном сообщении
+MAX_REPORTED_ERRORS = 10
+
+# Игровой никнейм – @TelegramUsername (допускаем -, – и — в качестве разделителя).
+# Строка может быть целиком в скобках, начинаться с номера ("5. ") и заканчиваться
+# примечанием в скобках ("(капитан)"); номер и примечание отбрасываются.
+PLAYER_LINE_PATTERN = re.compile(
+    r"^\(?\s*(?:\d+[.)]\s+)?(.+?)\s*[-–—]\s*@([^\s()]+)\s*(?:\([^()]*\))?\s*\)?$"
+)
+# Юзернейм Telegram: 4–32 символа, латиница, цифры и _, начинается с буквы
+USERNAME_PATTERN = re.compile(r"^[a-zA-Z][a-zA-Z0-9_]{3,31}$")
+
+
+def parse_roster(text: str) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """Разобрать список игроков.
+
+    Возвращает список пар (никнейм, юзернейм) и список ошибок с номерами строк.
+    Пустые строки пропускаются, повторяющиеся юзернеймы считаются ошибкой.
+    """
+    players = []
+    errors = []
+    seen_usernames = {}
+
+    for line_number, line in enumerate(text.split('\n'), start=1):
+        line = line.strip()
+        if not line:
+            continue
+
+        match = PLAYER_LINE_PATTERN.match(line)
+        if not match:
+            errors.append(f"Строка {line_number}: не соответствует формату «Никнейм – @username»")
+            continue
+
+        nickname = match.group(1).strip()
+        username = match.group(2)
+
+        if not USERNAME_PATTERN.match(username):
+            errors.append(f"Строка {line_number}: некорректный юзернейм @{username}")
+            continue
+
+        key = username.casefold()
+        if key in seen_usernames:
+            errors.append(f"Строка {line_number}: @{username} уже указан в строке {seen_usernames[key]}")
+            continue
+
+        seen_usernames[key] = line_number
+        players.append((nickname, username))
+
+    return players, errors
@@ -0,0 +1,75 @@
+import logging
+import sys
+import time
+
+from telegram import Update
+from telegram.ext import ContextTypes, ConversationHandler
+
+logger = logging.getLogger(__name__)
+
+# Через сколько секунд бездействия диалог регистрации завершается
+CONVERSATION_TIMEOUT = 30 * 60
+# Через сколько секунд бездействия данные пользователя удаляются сборщиком
+USER_DATA_TTL = 2 * 60 * 60
+# Как часто запускается сборщик
+SWEEP_INTERVAL = 10 * 60
+
+# Ограничения на данные, которые храним для одного пользователя
+MAX_TEAM_NAME_LENGTH = 64
+
+LAST_ACTIVITY_KEY = 'last_activity'
+REGISTRATION_KEYS = ('team_name', 'players', 'subscription_message', 'captain_contact')
+
+
+async def track_activity(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Отметить время последней активности пользователя (вызывается для каждого апдейта)."""
+    if context.user_data is not None:
+        context.user_data[LAST_ACTIVITY_KEY] = time.monotonic()
+
+
+def clear_registration_data(user_data: dict) -> None:
+    """Удалить из user_data всё, что относится к незавершённой регистрации."""
+    for key in REGISTRATION_KEYS:
+        user_data.pop(key, None)
+
+
+def estimate_size(obj, _seen: set = None) -> int:
+    """Приблизительный размер объекта в байтах с учётом вложенных коллекций."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in obj)
+    return size
+
+
+async def handle_conversation_timeout(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Очистить данные пользователя, когда диалог завершился по таймауту."""
+    clear_registration_data(context.user_data)
+    return ConversationHandler.END
+
+
+async def sweep_user_data(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Периодически удалять данные пользователей, которые давно не проявляли активности."""
+    application = context.application
+    now = time.monotonic()
+
+    expired = [
+        user_id
+        for user_id, user_data in application.user_data.items()
+        if now - user_data.setdefault(LAST_ACTIVITY_KEY, now) > USER_DATA_TTL
+    ]
+
+    freed_bytes = 0
+    for user_id in expired:
+        freed_bytes += estimate_size(application.user_data[user_id])
+        application.drop_user_data(user_id)
+
+    if expired:
+        logger.info(f"User data sweep: evicted {len(expired)} entries, freed ~{freed_bytes} bytes")
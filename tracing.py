@@ -0,0 +1,163 @@
+import collections
+import contextvars
+import cProfile
+import functools
+import heapq
+import io
+import pstats
+import time
+import traceback
+from contextlib import contextmanager
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+# Сколько последних трассировок хранить в памяти
+MAX_STORED_TRACES = 200
+# Сколько строк статистики cProfile сохранять для одной трассировки
+PROFILE_STATS_LINES = 15
+# Глубина стека, который сохраняется для каждого спана при семплировании
+SPAN_STACK_LIMIT = 6
+# Сколько трассировок можно запросить за раз, чтобы не упереться в лимиты Telegram
+MAX_SLOWEST_TRACES = 10
+# Максимальная длина одного сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+_recent_traces = collections.deque(maxlen=MAX_STORED_TRACES)
+_profile_budget = 0
+_profiling_active = False
+
+
+class Trace:
+    def __init__(self, handler_name: str, user_id: int = None):
+        self.handler_name = handler_name
+        self.user_id = user_id
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self.capture_stacks = False
+        self.profile_stats = None
+
+
+@contextmanager
+def span(name: str):
+    """Засечь время внешнего вызова внутри текущей трассировки.
+
+    Используется вокруг await: `with span("bot.get_chat_member"): await ...`.
+    Вне трассируемого обработчика ничего не делает.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+
+    stack = traceback.format_stack(limit=SPAN_STACK_LIMIT)[:-2] if trace.capture_stacks else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.spans.append((name, start - trace.start, time.perf_counter() - start, stack))
+
+
+def traced(handler):
+    """Записывать трассировку выполнения обработчика.
+
+    Вложенные трассируемые вызовы попадают в трассировку внешнего обработчика.
+    Если включено семплирование, обработчик выполняется под cProfile; так как профилировщик
+    общий для потока, одновременно профилируется только одно обновление, а в статистику
+    попадают и задачи, выполнявшиеся параллельно с ним.
+    """
+    @functools.wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args):
+        global _profile_budget, _profiling_active
+
+        if _current_trace.get() is not None:
+            return await handler(update, context, *args)
+
+        user = update.effective_user
+        trace = Trace(handler.__name__, user.id if user else None)
+
+        profiler = None
+        if _profile_budget > 0 and not _profiling_active:
+            _profile_budget -= 1
+            _profiling_active = True
+            trace.capture_stacks = True
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        token = _current_trace.set(trace)
+        try:
+            return await handler(update, context, *args)
+        finally:
+            _current_trace.reset(token)
+            trace.duration = time.perf_counter() - trace.start
+
+            if profiler:
+                profiler.disable()
+                _profiling_active = False
+                stream = io.StringIO()
+                pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(PROFILE_STATS_LINES)
+                trace.profile_stats = stream.getvalue()
+
+            _recent_traces.append(trace)
+
+    return wrapper
+
+
+def enable_profiling(count: int) -> None:
+    """Профилировать следующие count трассируемых обновлений."""
+    global _profile_budget
+    _profile_budget = count
+
+
+def get_slowest_traces(count: int) -> list:
+    return heapq.nlargest(count, _recent_traces, key=lambda trace: trace.duration)
+
+
+def format_trace(trace: Trace) -> str:
+    """Текстовое описание трассировки, обрезанное до размера сообщения Telegram.
+
+    Статистика cProfile идёт сразу после заголовка, одинаковые стеки печатаются один раз,
+    а при нехватке места обрезается список спанов.
+    """
+    started_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(trace.started_at))
+    accounted = sum(duration for _, _, duration, _ in trace.spans)
+
+    text = (
+        f"⏱ {trace.handler_name}: {trace.duration * 1000:.0f} мс\n"
+        f"Пользователь: {trace.user_id}, начало: {started_at}\n"
+        f"Вне спанов: {(trace.duration - accounted) * 1000:.0f} мс\n"
+    )
+    if trace.profile_stats:
+        text += f"\n{trace.profile_stats}"
+    text = text[:MAX_MESSAGE_LENGTH]
+
+    truncated = "\n… (обрезано)"
+    budget = MAX_MESSAGE_LENGTH - len(text) - len(truncated)
+
+    span_lines = ["\nСпаны:"] if trace.spans else []
+    stack_ids = {}
+    for name, offset, duration, stack in trace.spans:
+        line = f"+{offset * 1000:.0f} мс  {name}: {duration * 1000:.0f} мс"
+        if stack:
+            stack_text = "".join(stack)
+            stack_ids.setdefault(stack_text, len(stack_ids) + 1)
+            line += f"  [стек {stack_ids[stack_text]}]"
+        span_lines.append(line)
+
+    if stack_ids:
+        span_lines.append("\nСтеки:")
+        for stack_text, stack_id in stack_ids.items():
+            span_lines.append(f"[стек {stack_id}]\n{stack_text.rstrip()}")
+
+    for index, line in enumerate(span_lines):
+        if len(line) + 1 > budget:
+            if index:
+                text += truncated
+            break
+        text += f"{line}\n"
+        budget -= len(line) + 1
+
+    return text